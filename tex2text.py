@@ -3,36 +3,94 @@ import re
 import tarfile
 import argparse
 import time
-import pandas as pd
-from pylatexenc.latex2text import LatexNodes2Text
-import shutil
+import csv
+from pylatexenc import latexwalker
+from pylatexenc.latex2text import LatexNodes2Text, MacroTextSpec, EnvironmentTextSpec, get_default_latex_context_db
 import ftfy
+import string
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from collections import deque
+from itertools import islice
+from functools import partial
 
-def extract_tarfile(tar_file, path='.'):
+# Tables, figures and math blocks removed by clean_tex_content, matched in a single pass.
+# Escaped characters and comments are matched too, so that \$ or a $ in a comment is
+# never taken for a math delimiter; they are kept as they are.
+_RE_BLOCKS = re.compile(
+    r'(?P<escape>\\[\\$%])'
+    r'|(?P<comment>%[^\n]*)'
+    r'|\\begin\{(?P<env>(?:table|tabular|figure|equation|align|gather|multline|eqnarray)\*?)\}.*?\\end\{(?P=env)\}'
+    r'|(?P<display_math>\$\$(?:\\.|[^$\\])*\$\$|\\\[.*?\\\])'
+    r'|(?P<inline_math>\$(?:\\.|[^$\\])+\$|\\\(.*?\\\))',
+    re.DOTALL
+)
+
+_RE_DOCUMENTCLASS = re.compile(r'\\documentclass')
+
+# Files pulled into the main .tex file, outside of comments
+_RE_INPUT = re.compile(r'\\(?:input|include)\s*\{\s*([^{}]+?)\s*\}|\\input\s+([^\s{}\\%]+)')
+_RE_COMMENT = re.compile(r'(?<!\\)%')
+
+# ASCII characters that ftfy still rewrites: HTML entities, carriage returns and control characters
+_RE_FTFY_ASCII_FIXES = re.compile(r'[&\r\x00-\x08\x0b\x0e-\x1f\x7f]')
+
+# Read the compressed archives in large chunks to cut down on small inflate calls
+_TAR_BUFSIZE = 1 << 20
+
+# Archives read ahead of the worker processes into the page cache, so their I/O overlaps with parsing
+PREFETCH_THREADS = 2
+PREFETCH_PER_WORKER = 2
+
+STATS_FIELDS = ['file', 'num_words', 'num_paragraphs', 'num_chars', 'extraction_time']
+
+_COMMAND_LETTERS = frozenset(string.ascii_letters)
+_RE_BRACE = re.compile(r'[{}]')
+
+# Where the clean_text scanner stops copying plain text: newlines, commands and URLs
+_RE_SCAN_STOP = re.compile(r'[\n\\<]')
+_RE_SPACE_RUN = re.compile(r'\s+')
+
+# Most tables, figures and math are stripped by clean_tex_content before parsing, as the
+# parser would otherwise build nodes for all of them. Whatever the regex misses is still
+# discarded while rendering, and math_mode='remove' drops any remaining math
+DISCARDED_ENVIRONMENTS = ['table', 'table*', 'tabular', 'tabular*', 'figure', 'figure*']
+
+# Citations and references are dropped outright rather than rendered as <cit.> or <ref>
+# placeholders that would have to be removed from the text afterwards
+DISCARDED_MACROS = ['cite', 'citet', 'citep', 'ref', 'autoref', 'cref', 'Cref', 'eqref']
+
+_LATEX_CONTEXT = get_default_latex_context_db()
+_LATEX_CONTEXT.add_context_category(
+    'tex2text-discard',
+    macros=[MacroTextSpec(macro, discard=True) for macro in DISCARDED_MACROS],
+    environments=[EnvironmentTextSpec(env, discard=True) for env in DISCARDED_ENVIRONMENTS],
+    prepend=True
+)
+
+# Built once per process, as setting up its macro and environment tables is costly
+_CONVERTER = LatexNodes2Text(latex_context=_LATEX_CONTEXT, math_mode='remove')
+
+# The parser otherwise builds a fresh context for every document
+_PARSER_CONTEXT = latexwalker.get_default_latex_context_db()
+
+def decode_with_fallback(data):
     """
-    Extracts the contents of a .tar.gz file to a specified directory.
+    Decodes the content of a file with multiple fallback encodings.
+    
+    Latin-1 maps every byte to a character, so decoding never fails.
     
     Parameters:
-    tar_file (str): The path to the .tar.gz file.
-    path (str): The directory to extract the contents to.
+    data (bytes): The raw content of the file.
     
     Returns:
-    None
+    str: The content of the file.
     """
-    if not tarfile.is_tarfile(tar_file):
-        print(f"Error: {tar_file} is not a valid tar.gz file.")
-        return
-    
-    try:
-        with tarfile.open(tar_file, 'r:gz') as tar:
-            members = tar.getmembers()
-            if len(members) == 1 and members[0].isfile():
-                tar.extract(members[0], path=path)
-            else:
-                tar.extractall(path=path)
-        print(f"Successfully extracted {tar_file}")
-    except Exception as e:
-        print(f"Error extracting {tar_file}: {e}")
+    encodings = ['utf-8', 'latin-1']
+    for encoding in encodings:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
 
 def read_file_with_fallback(file_path):
     """
@@ -44,32 +102,31 @@ def read_file_with_fallback(file_path):
     Returns:
     str: The content of the file.
     """
-    encodings = ['utf-8', 'latin-1', 'iso-8859-1']
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                return f.read()
-        except UnicodeDecodeError:
-            continue
-    raise UnicodeDecodeError(f"Failed to read {file_path} with tried encodings")
+    with open(file_path, 'rb') as f:
+        return decode_with_fallback(f.read())
 
-def read_tex_files(directory):
+def read_tex_from_tar(tar_file):
     """
-    Reads all .tex files in a directory.
+    Reads all .tex files in a .tar.gz file without extracting them to disk.
+    
+    The archive is read sequentially as a stream, in large buffered chunks.
     
     Parameters:
-    directory (str): The directory containing .tex files.
+    tar_file (str): The path to the .tar.gz file.
     
     Returns:
     list of tuples: A list of tuples, each containing the file name and its content.
     """
     tex_files = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".tex"):
-                file_path = os.path.join(root, file)
-                content = read_file_with_fallback(file_path)
-                tex_files.append((file, content))
+    try:
+        with tarfile.open(tar_file, 'r|gz', bufsize=_TAR_BUFSIZE) as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith(".tex"):
+                    content_bytes = tar.extractfile(member).read()
+                    tex_files.append((member.name, decode_with_fallback(content_bytes)))
+        print(f"Successfully read {tar_file}")
+    except Exception as e:
+        print(f"Error reading {tar_file}: {e}")
     return tex_files
 
 def find_main_tex_file(tex_files):
@@ -83,12 +140,66 @@ def find_main_tex_file(tex_files):
     tuple: The main .tex file and its content.
     """
     for file, content in tex_files:
-        if re.search(r'\\documentclass', content):
+        if _RE_DOCUMENTCLASS.search(content):
             return file, content
     if isinstance(tex_files, list) and len(tex_files) > 0:
         return tex_files[0]  # Return the first file if no documentclass is found
     return "", ""
 
+def inline_input_files(main_tex_file, main_tex_content, tex_files):
+    r"""
+    Replaces the \input and \include commands of the main .tex file with the content of the
+    files they refer to, so that a paper split across several files is converted in one pass.
+    
+    Both the braced form and the primitive \input file form are recognized. As in TeX, every
+    inlined file ends with an end of line, so a trailing comment cannot swallow the rest of
+    the line that included it.
+    
+    >>> files = [('paper/main.tex', ''), ('paper/a.tex', 'A % note'), ('paper/sec/b.tex', r'B \input{sec/c}'),
+    ...          ('paper/sec/c.tex', r'C \input sec/b'), ('d.tex', 'D')]
+    >>> print(inline_input_files('paper/main.tex', r'\input{a} after % \input{a}', files))
+    A % note
+     after % \input{a}
+    >>> print(inline_input_files('paper/main.tex', r'\include{sec/b.tex} \input d', files))
+    B C \input sec/b
+     D
+    <BLANKLINE>
+    
+    Parameters:
+    main_tex_file (str): The name of the main .tex file.
+    main_tex_content (str): The content of the main .tex file.
+    tex_files (list of tuples): A list of tuples, each containing the file name and its content.
+    
+    Returns:
+    str: The content of the main .tex file with its input files inlined.
+    """
+    sources = {os.path.normpath(file)[:-4]: content for file, content in tex_files}
+    base = os.path.dirname(main_tex_file)
+
+    def inline(content, stack):
+        def replace(match):
+            name = match.group(1) or match.group(2)
+            if name.endswith('.tex'):
+                name = name[:-4]
+            for key in (os.path.normpath(os.path.join(base, name)), os.path.normpath(name)):
+                if key in sources and key not in stack:  # Leave cyclic inputs alone
+                    content = inline(sources[key], stack | {key})
+                    return content if content.endswith('\n') else content + '\n'
+            return match.group()
+
+        if '\\in' not in content:
+            return content
+        lines = content.split('\n')
+        for i, line in enumerate(lines):
+            if '\\in' in line:
+                # Commented out inputs are not inlined
+                comment = _RE_COMMENT.search(line)
+                end = comment.start() if comment else len(line)
+                lines[i] = _RE_INPUT.sub(replace, line[:end]) + line[end:]
+        return '\n'.join(lines)
+
+    return inline(main_tex_content, frozenset([os.path.normpath(main_tex_file)[:-4]]))
+
 def clean_tex_content(tex_content, debug=False):
     """
     Cleans the TeX content by removing tables, figures, and math blocks.
@@ -100,26 +211,60 @@ def clean_tex_content(tex_content, debug=False):
     Returns:
     str: The cleaned TeX content.
     """
-    def debug_print(message):
+    removed = {}
+
+    def remove_block(match):
+        if match.lastgroup in ('escape', 'comment'):
+            return match.group()
         if debug:
-            print(message)
-
-    def remove_pattern(pattern, description):
-        matches = re.findall(pattern, tex_content, flags=re.DOTALL)
-        if matches:
-            debug_print(f"Found {len(matches)} {description} blocks.")
-            for match in matches:
-                debug_print(f"Removing {description} block: {match[:100]}...")  # Print the first 100 characters of each match
-        return re.sub(pattern, '', tex_content, flags=re.DOTALL)
-
-    tex_content = remove_pattern(r'\\begin\{table\}.*?\\end\{table\}', 'table')
-    tex_content = remove_pattern(r'\\begin\{tabular\}.*?\\end\{tabular\}', 'tabular')
-    tex_content = remove_pattern(r'\\begin\{figure\}.*?\\end\{figure\}', 'figure')  # Added for figures
-    tex_content = remove_pattern(r'\$\$.*?\$\$', 'display math')
-    tex_content = remove_pattern(r'\$.*?\$', 'inline math')
+            description = match.group('env') or match.lastgroup.replace('_', ' ')
+            removed.setdefault(description, []).append(match.group())
+        return ''
+
+    tex_content = _RE_BLOCKS.sub(remove_block, tex_content)
+    for description, matches in removed.items():
+        print(f"Found {len(matches)} {description} blocks.")
+        for match in matches:
+            print(f"Removing {description} block: {match[:100]}...")  # Print the first 100 characters of each match
 
     return tex_content
 
+def report_removed_blocks(nodelist):
+    """
+    Prints the tables, figures, and math blocks that the converter discards from the parsed TeX content.
+    
+    Parameters:
+    nodelist (list): The nodes parsed from the TeX content by pylatexenc.
+    
+    Returns:
+    None
+    """
+    removed = {}
+
+    def collect(nodes):
+        for node in nodes:
+            if node is None:
+                continue
+            if node.isNodeType(latexwalker.LatexMathNode):
+                removed.setdefault(f"{node.displaytype} math", []).append(node.latex_verbatim())
+            elif node.isNodeType(latexwalker.LatexEnvironmentNode):
+                spec = _PARSER_CONTEXT.get_environment_spec(node.environmentname)
+                if node.environmentname in DISCARDED_ENVIRONMENTS or (spec is not None and spec.is_math_mode):
+                    removed.setdefault(node.environmentname, []).append(node.latex_verbatim())
+                else:
+                    collect(node.nodelist)
+            elif node.isNodeType(latexwalker.LatexGroupNode):
+                collect(node.nodelist)
+            elif node.isNodeType(latexwalker.LatexMacroNode) and node.macroname not in DISCARDED_MACROS:
+                if node.nodeargd is not None and node.nodeargd.argnlist:
+                    collect(node.nodeargd.argnlist)
+
+    collect(nodelist)
+    for description, blocks in removed.items():
+        print(f"Found {len(blocks)} {description} blocks.")
+        for block in blocks:
+            print(f"Removing {description} block: {block[:100]}...")  # Print the first 100 characters of each block
+
 def fix_text_issues(text):
     """
     Fixes text issues such as ligatures and other character problems.
@@ -130,34 +275,93 @@ def fix_text_issues(text):
     Returns:
     str: The fixed text.
     """
+    # Pure ASCII text has no mojibake or ligatures, so ftfy can be skipped unless
+    # it contains HTML entities, line breaks or control characters it would fix
+    if text.isascii() and not _RE_FTFY_ASCII_FIXES.search(text):
+        return text
     fixed_text = ftfy.fix_text(text)
     return fixed_text
 
-def tex_to_text(tex_content):
+def tex_to_text(tex_content, debug=False):
     """
     Converts TeX content to plain text using pylatexenc.
     
     Parameters:
     tex_content (str): The TeX content to be converted.
+    debug (bool): If True, prints the blocks discarded during the conversion.
     
     Returns:
     str: The converted plain text.
     """
-    converter = LatexNodes2Text()
     try:
-        text = converter.latex_to_text(tex_content)
-        return text
+        nodelist = latexwalker.LatexWalker(tex_content, latex_context=_PARSER_CONTEXT).get_latex_nodes()[0]
+        text = _CONVERTER.nodelist_to_text(nodelist)
     except Exception as e:
         print(f"Error converting TeX to text: {e}")
         return tex_content
 
+    # Debug output must never change the converted text
+    if debug:
+        try:
+            report_removed_blocks(nodelist)
+        except Exception as e:
+            print(f"Error reporting removed blocks: {e}")
+    return text
+
+def match_braces(text):
+    """
+    Pairs up the braces in the text, so command arguments can be skipped without rescanning.
+    
+    Parameters:
+    text (str): The text to be scanned.
+    
+    Returns:
+    dict: The index of the matching closing brace for each opening brace that has one.
+    """
+    closing = {}
+    stack = []
+    for match in _RE_BRACE.finditer(text):
+        if match.group() == '{':
+            stack.append(match.start())
+        elif stack:
+            closing[stack.pop()] = match.start()
+    return closing
+
+def skip_command(text, start, closing):
+    """
+    Finds the end of a LaTeX command with a braced argument, such as \\cite{...}.
+    
+    Parameters:
+    text (str): The text being scanned.
+    start (int): The index of the backslash that starts the command.
+    closing (dict): The matching closing brace of each opening brace, from match_braces.
+    
+    Returns:
+    int: The index just past the closing brace, or start if there is no such command.
+    """
+    n = len(text)
+    i = start + 1
+    while i < n and text[i] in _COMMAND_LETTERS:
+        i += 1
+    if i == start + 1:
+        return start
+    if i < n and text[i] == '*':
+        i += 1
+    if i >= n or text[i] != '{' or i not in closing:
+        return start
+    return closing[i] + 1
+
 def clean_text(text):
     """
     Cleans the plain text by removing LaTeX commands and unwanted tags, and fixing text issues.
     
+    The text is scanned once from left to right: commands with a braced argument
+    (\\cite, \\ref, \\label, \\begin, \\end, ...) are dropped, angle brackets around
+    URLs are removed, and whitespace is normalized so that paragraphs are separated
+    by a blank line and single newlines within a paragraph become spaces.
+    
     Parameters:
     text (str): The text to be cleaned.
-    debug (bool): If True, prints debug information.
     
     Returns:
     str: The cleaned text.
@@ -165,36 +369,153 @@ def clean_text(text):
     # Fix text issues
     text = fix_text_issues(text)
 
-    # Preserve paragraphs by keeping double newlines
-    text = re.sub(r'(\n\s*\n)', '\n\n', text)
+    closing = match_braces(text)
+    out = []
+    pending = []  # Whitespace seen since the last kept text
+    newlines = 0
+
+    def keep(chunk):
+        nonlocal pending, newlines
+        # Preserve paragraphs and restore single newlines within blocks
+        if pending and out:  # Leading whitespace is stripped
+            if newlines >= 2:
+                out.append('\n\n')
+            elif newlines == 1:
+                out.append(''.join(pending).replace('\n', ' '))
+            else:
+                out.append(''.join(pending))
+        pending = []
+        newlines = 0
+        out.append(chunk)
+
+    n = len(text)
+    i = 0
+    url_close = -1  # Index of the closing bracket of the URL being scanned
+    while i < n:
+        # Copy plain text up to the next newline, backslash or angle bracket in one step,
+        # holding back its surrounding spaces in case they border a paragraph break
+        stop = _RE_SCAN_STOP.search(text, i)
+        j = stop.start() if stop else n
+        if i <= url_close < j:
+            j = url_close
+        if j > i:
+            segment = text[i:j]
+            start = len(segment) - len(segment.lstrip())
+            end = len(segment.rstrip())
+            if start < end:
+                pending.append(segment[:start])
+                keep(segment[start:end])
+                pending.append(segment[end:])
+            else:
+                pending.append(segment)
+        if j == n:
+            break
+        i = j
+        c = text[i]
+        
+        if c == '\\':
+            # Remove common LaTeX commands and unwanted tags
+            end = skip_command(text, i, closing)
+            if end != i:
+                i = end
+                continue
+        elif c == '<':
+            # Remove angle brackets around URLs, but not nested within one
+            url = False
+            for scheme in ('http://', 'https://') if i > url_close else ():
+                if text.startswith(scheme, i + 1):
+                    close = text.find('>', i + 1 + len(scheme))
+                    url = close > i + 1 + len(scheme)
+                    break
+            if url:
+                # The URL itself is scanned like any other text
+                url_close = close
+                i += 1
+                continue
+        elif c == '>':
+            # Closing bracket of a URL
+            i += 1
+            continue
+        else:
+            # Whitespace containing newlines
+            end = _RE_SPACE_RUN.match(text, i).end()
+            pending.append(text[i:end])
+            newlines += text.count('\n', i, end)
+            i = end
+            continue
+        
+        keep(c)
+        i += 1
     
-    # Remove common LaTeX commands and unwanted tags
-    text = re.sub(r'\\cite\{.*?\}', '<cit.>', text)
-    text = re.sub(r'\\ref\{.*?\}', '<ref>', text)
-    text = re.sub(r'\\label\{.*?\}', '', text)
-    text = re.sub(r'\\begin\{.*?\}', '', text)
-    text = re.sub(r'\\end\{.*?\}', '', text)
-    text = re.sub(r'\\[a-zA-Z]+\*?\{.*?\}', '', text)
+    return ''.join(out)
+
+def prefetch_archive(tar_file):
+    """
+    Reads a .tar.gz file and discards its content, so that it is in the page cache when a
+    worker process opens it.
     
-    # Remove specific unwanted tags
-    text = re.sub(r'<cit.>', '', text)
-    text = re.sub(r'<ref>', '', text)
+    Parameters:
+    tar_file (str): The path to the .tar.gz file.
     
-    # Remove angle brackets around URLs
-    text = re.sub(r'<(https?://[^>]+)>', r'\1', text)
+    Returns:
+    None
+    """
+    try:
+        with open(tar_file, 'rb') as f:
+            while f.read(_TAR_BUFSIZE):
+                pass
+    except OSError:
+        pass  # Left for read_tex_from_tar to report
+
+def process_tar_file(file, input_folder, output_folder, debug):
+    """
+    Extracts text from the TeX files of a single .tar.gz archive and computes its statistics.
     
-    # Restore single newlines within blocks
-    text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
+    Parameters:
+    file (str): The name of the .tar.gz file.
+    input_folder (str): The folder containing the .tar.gz file.
+    output_folder (str): The folder to save the extracted text file.
+    debug (bool): If True, prints debug information.
     
-    # Ensure there is a newline after each block
-    text = re.sub(r'(\n\n)+', '\n\n', text)
+    Returns:
+    dict: The statistics of the extracted text.
+    """
+    output_txt_file = os.path.join(output_folder, f"{file[:-7]}.txt")
     
-    return text.strip()
+    start_time = time.time()
+    tex_files = read_tex_from_tar(os.path.join(input_folder, file))
+    main_tex_file, main_tex_content = find_main_tex_file(tex_files)
+    main_tex_content = inline_input_files(main_tex_file, main_tex_content, tex_files)
+
+    clean_tex = clean_tex_content(main_tex_content, debug)
+    text = tex_to_text(clean_tex, debug)
+    clean_text_content = clean_text(text)
+    
+    num_words = len(clean_text_content.split())
+    num_paragraphs = clean_text_content.count('\n\n') + 1
+    num_chars = len(clean_text_content)
+    extraction_time = time.time() - start_time
+    
+    # Encode once and write the whole buffer in a single call
+    with open(output_txt_file, 'wb') as f:
+        f.write(clean_text_content.encode('utf-8'))
+    
+    return {
+        'file': file,
+        'num_words': num_words,
+        'num_paragraphs': num_paragraphs,
+        'num_chars': num_chars,
+        'extraction_time': extraction_time
+    }
 
 def extract_text_and_stats(input_folder, output_folder, output_file, force, debug):
     """
     Extracts text from TeX files in .tar.gz archives, cleans the text, and generates statistics.
     
+    The archives are independent of each other, so they are processed in parallel
+    using one worker process per CPU. Meanwhile, background threads read the next
+    archives ahead into the page cache, so that disk I/O overlaps with parsing.
+    
     Parameters:
     input_folder (str): The folder containing the .tar.gz files.
     output_folder (str): The folder to save the extracted text files.
@@ -208,51 +529,44 @@ def extract_text_and_stats(input_folder, output_folder, output_file, force, debu
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     
-    data = []
-    for file in os.listdir(input_folder):
-        if file.endswith(".tar.gz"):
-            tar_file = os.path.join(input_folder, file)
-            extract_path = os.path.join(input_folder, file[:-7])  # Remove .tar.gz extension
-            output_txt_file = os.path.join(output_folder, f"{file[:-7]}.txt")
-            
-            if os.path.exists(output_txt_file) and not force:
-                print(f"Skipping already processed file: {file}")
-                continue
-            
-            if not os.path.exists(extract_path):
-                os.makedirs(extract_path)
-            
-            start_time = time.time()
-            extract_tarfile(tar_file, extract_path)
-            
-            tex_files = read_tex_files(extract_path)
-            main_tex_file, main_tex_content = find_main_tex_file(tex_files)
-
-            clean_tex = clean_tex_content(main_tex_content, debug)
-            text = tex_to_text(clean_tex)
-            clean_text_content = clean_text(text)
-            
-            num_words = len(clean_text_content.split())
-            num_paragraphs = clean_text_content.count('\n\n') + 1
-            num_chars = len(clean_text_content)
-            extraction_time = time.time() - start_time
-            
-            with open(output_txt_file, 'w', encoding='utf-8') as f:
-                f.write(clean_text_content)
-            
-            data.append({
-                'file': file,
-                'num_words': num_words,
-                'num_paragraphs': num_paragraphs,
-                'num_chars': num_chars,
-                'extraction_time': extraction_time
-            })
-            
-            # Remove extracted files
-            shutil.rmtree(extract_path)
-    
-    df = pd.DataFrame(data)
-    df.to_csv(output_file, index=False)
+    # List the already processed files once instead of checking each output file
+    done = set()
+    if not force:
+        done = {file[:-4] for file in os.listdir(output_folder) if file.endswith(".txt")}
+    
+    files = []
+    with os.scandir(input_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(".tar.gz") and entry.is_file():
+                if entry.name[:-7] in done:
+                    print(f"Skipping already processed file: {entry.name}")
+                    continue
+                files.append(entry.name)
+    process = partial(process_tar_file, input_folder=input_folder, output_folder=output_folder, debug=debug)
+    
+    workers = os.cpu_count() or 1
+    with open(output_file, 'w', newline='', encoding='utf-8') as f, \
+            ThreadPoolExecutor(max_workers=PREFETCH_THREADS) as io_pool, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        writer = csv.DictWriter(f, fieldnames=STATS_FIELDS)
+        writer.writeheader()
+        
+        # Keep a bounded number of archives read ahead of the workers
+        pending_files = iter(files)
+        reads = deque()
+        running = set()
+        while True:
+            for file in islice(pending_files, PREFETCH_PER_WORKER * workers - len(reads)):
+                reads.append((file, io_pool.submit(prefetch_archive, os.path.join(input_folder, file))))
+            while reads and len(running) < workers:
+                file, read = reads.popleft()
+                read.result()
+                running.add(executor.submit(process, file))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                writer.writerow(future.result())
     print(f"Extraction complete. Statistics saved to {output_file}")
 
 if __name__ == "__main__":